@@ -3,6 +3,10 @@
 from __future__ import annotations
 
 import base64
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 
 import cv2
@@ -10,26 +14,222 @@ import numpy as np
 from flask import Flask, jsonify, request
 
 
+# Make sure the cascade's internal parallel_for_ actually fans out: some
+# Python wheels default to a single thread. The frontal and profile sweeps
+# run concurrently (see DETECT_POOL) and each fans out internally, so give
+# each roughly half the machine and keep a core for the serving thread.
+cv2.setUseOptimized(True)
+cv2.setNumThreads(max(1, ((os.cpu_count() or 2) - 1) // 2))
+
+# With OpenCL available, routing frames through UMat keeps the gray
+# conversion, downscale, and cascade sweep on the (integrated) GPU. Ask for
+# the T-API explicitly first — some builds leave it disabled by default.
+cv2.ocl.setUseOpenCL(True)
+USE_OPENCL = cv2.ocl.haveOpenCL() and cv2.ocl.useOpenCL()
+
+# detectMultiScale releases the GIL, so the frontal and profile sweeps can
+# genuinely overlap; keep the pool alive so threads are reused per frame.
+DETECT_POOL = ThreadPoolExecutor(max_workers=2)
+
+
 app = Flask(__name__)
 
 
 @dataclass
 class TrackingState:
     tracked_face: tuple[int, int, int, int] | None = None
+    tracker: "cv2.Tracker | None" = None
+    frames_since_detect: int = 0
+    # Scratch buffer reused across frames so cvtColor/flip write in place
+    # instead of allocating a fresh gray plane per request.
+    gray_buf: np.ndarray | None = None
+    small_buf: np.ndarray | None = None
+    # Last input size handed to the YuNet detector; setInputSize rebuilds
+    # internal buffers, so only call it when the frame dimensions change.
+    yunet_size: tuple[int, int] | None = None
+    # 8x8 average-pooled fingerprint of the previous frame, plus whether the
+    # previous sweep actually confirmed a face — a static scene is only a
+    # reason to skip the sweep if the face was there last time.
+    prev_thumb: np.ndarray | None = None
+    last_sweep_hit: bool = False
 
 
 STATE = TrackingState()
 
-FACE_CASCADE = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
-PROFILE_CASCADE = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_profileface.xml")
-NOSE_CASCADE = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_mcs_nose.xml")
+# The server handles requests on multiple threads (waitress, or the dev
+# server with threaded=True), and everything in STATE — the native KCF
+# tracker, the dst= scratch buffers, the replay bookkeeping — is mutated
+# per request. Serialise the tracking section of /analyze behind this
+# lock; detection itself still fans out via DETECT_POOL and OpenCV's own
+# thread pool, and request I/O still overlaps outside the lock.
+STATE_LOCK = threading.Lock()
+
+# Run the full cascade sweep only every Nth frame; a correlation tracker
+# carries the face box in between at a fraction of the cost. Builds without
+# a tracker still skip every other sweep by replaying the last box — faces
+# barely move between consecutive frames.
+DETECT_INTERVAL = 6
+REUSE_INTERVAL = 2
+
+# Haar cost scales with pixel count, so sweep a quarter-resolution gray
+# frame and scale the boxes back up. A webcam face spans roughly 120-400 px
+# at full resolution; the bounds below are that range in detection space.
+DETECT_INV_SCALE = 4
+DETECT_SCALE = 1 / DETECT_INV_SCALE
+DETECT_MIN_SIZE = (120 // DETECT_INV_SCALE, 120 // DETECT_INV_SCALE)
+DETECT_MAX_SIZE = (400 // DETECT_INV_SCALE, 400 // DETECT_INV_SCALE)
+
+# L1 distance between 8x8 frame fingerprints below which the scene counts
+# as unchanged and the sweep is skipped.
+SCENE_DIFF_THRESHOLD = 40
+
+
+def _gray_flipped(image_array: np.ndarray) -> np.ndarray:
+    """BGR frame to mirrored gray, writing into a reused scratch buffer."""
+    shape = image_array.shape[:2]
+    if STATE.gray_buf is None or STATE.gray_buf.shape != shape:
+        STATE.gray_buf = np.empty(shape, np.uint8)
+    cv2.cvtColor(image_array, cv2.COLOR_BGR2GRAY, dst=STATE.gray_buf)
+    cv2.flip(STATE.gray_buf, 1, dst=STATE.gray_buf)
+    return STATE.gray_buf
+
+
+def _mirrored_bgr(image_array: np.ndarray | None, gray: np.ndarray | None) -> np.ndarray:
+    """Mirrored colour frame for the tracker and DNN paths.
+
+    Raw-gray payloads arrive already mirrored but single-channel, so
+    replicate the luma; JPEG payloads decode to unmirrored BGR.
+    """
+    if image_array is not None:
+        return cv2.flip(image_array, 1)
+    return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+
+
+def _interpolated_result(box: tuple[int, int, int, int], band_top: int, band_bottom: int) -> dict:
+    """Build an /analyze response from a carried-over face box.
+
+    Used on frames where the cascade sweep is skipped; the nose is
+    approximated by the box centre, same as the no-nose-cascade fallback.
+    """
+    x, y, w, h = box
+    nose_y = y + h // 2
+    nose_outside_band = nose_y < band_top or nose_y > band_bottom
+    result = {
+        "face": [x, y, w, h],
+        "nose": [x + w // 2, nose_y],
+        "tracking_bad": nose_outside_band,
+        "status": "Tracking good",
+    }
+    if nose_outside_band:
+        result["status"] = "Tracking alert: face turned away or nose outside horizontal rectangle"
+    return result
+
+
+def _downscaled(gray: np.ndarray) -> np.ndarray:
+    """Detection-resolution copy of gray, written into a reused buffer."""
+    shape = (int(round(gray.shape[0] * DETECT_SCALE)), int(round(gray.shape[1] * DETECT_SCALE)))
+    if STATE.small_buf is None or STATE.small_buf.shape != shape:
+        STATE.small_buf = np.empty(shape, np.uint8)
+    cv2.resize(gray, (shape[1], shape[0]), dst=STATE.small_buf, interpolation=cv2.INTER_AREA)
+    return STATE.small_buf
+
 
-if FACE_CASCADE.empty():
+def _largest_box(boxes) -> np.ndarray:
+    """Return the box row with the largest w*h area (columns 2 and 3)."""
+    boxes = np.asarray(boxes)
+    if len(boxes) == 1:
+        # The typical frame has exactly one face; no key to evaluate then.
+        return boxes[0]
+    return boxes[(boxes[:, 2] * boxes[:, 3]).argmax()]
+
+
+def _create_tracker() -> "cv2.Tracker | None":
+    factory = getattr(cv2, "TrackerKCF_create", None)
+    if factory is None and hasattr(cv2, "legacy"):
+        factory = getattr(cv2.legacy, "TrackerKCF_create", None)
+    return factory() if factory is not None else None
+
+
+@functools.lru_cache(maxsize=8)
+def _load_cascade(name: str) -> cv2.CascadeClassifier | None:
+    cascade = cv2.CascadeClassifier(cv2.data.haarcascades + name)
+    return None if cascade.empty() else cascade
+
+
+def _first_cascade(*names: str) -> cv2.CascadeClassifier | None:
+    for name in names:
+        cascade = _load_cascade(name)
+        if cascade is not None:
+            return cascade
+    return None
+
+
+# LBP cascades compare bytes instead of summing Haar rectangles, roughly
+# halving sweep time; most pip wheels only bundle the Haar files, so fall
+# back to those when the LBP variants are absent.
+FACE_CASCADE = _first_cascade("lbpcascade_frontalface_improved.xml", "haarcascade_frontalface_default.xml")
+PROFILE_CASCADE = _first_cascade("lbpcascade_profileface.xml", "haarcascade_profileface.xml")
+NOSE_CASCADE = _load_cascade("haarcascade_mcs_nose.xml")
+
+if FACE_CASCADE is None:
     raise RuntimeError("Could not load frontal face cascade")
-if PROFILE_CASCADE.empty():
-    PROFILE_CASCADE = None
-if NOSE_CASCADE.empty():
-    NOSE_CASCADE = None
+
+# YuNet: one DNN forward pass gives the face box plus five landmarks
+# (including the nose tip), replacing all three cascade sweeps. The ~1 MB
+# ONNX model is not bundled; drop it next to this file under either of the
+# names the OpenCV zoo has published it as to enable the path.
+YUNET_MODELS = ("face_detection_yunet_2023mar.onnx", "face_detection_yunet.onnx")
+
+
+def _create_yunet() -> "cv2.FaceDetectorYN | None":
+    if not hasattr(cv2, "FaceDetectorYN"):
+        return None
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in YUNET_MODELS:
+        model = os.path.join(here, name)
+        if os.path.exists(model):
+            return cv2.FaceDetectorYN.create(model, "", (320, 240), 0.6, 0.3, 5000)
+    return None
+
+
+YUNET = _create_yunet()
+
+# FacemarkLBF regresses all 68 landmarks from an existing face box in ~1 ms
+# — cheaper and steadier than re-running a Haar cascade on the nose ROI.
+# Needs the opencv-contrib build plus the (unbundled) LBF model file.
+FACEMARK_MODEL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lbfmodel.yaml")
+NOSE_TIP_LANDMARK = 30
+
+
+def _create_facemark():
+    face_module = getattr(cv2, "face", None)
+    if face_module is None or not os.path.exists(FACEMARK_MODEL):
+        return None
+    facemark = face_module.createFacemarkLBF()
+    facemark.loadModel(FACEMARK_MODEL)
+    return facemark
+
+
+FACEMARK = _create_facemark()
+
+
+def _create_cuda_cascade():
+    cuda = getattr(cv2, "cuda", None)
+    factory = getattr(cv2, "cuda_CascadeClassifier", None)
+    if cuda is None or factory is None or cuda.getCudaEnabledDeviceCount() == 0:
+        return None
+    cascade = factory.create(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+    # Same pyramid bounds as the CPU sweep, in detection-space coordinates.
+    cascade.setScaleFactor(1.2)
+    cascade.setMinNeighbors(5)
+    cascade.setMinObjectSize(DETECT_MIN_SIZE)
+    cascade.setMaxObjectSize(DETECT_MAX_SIZE)
+    return cascade
+
+
+CUDA_CASCADE = _create_cuda_cascade()
+# Persistent device buffer so the upload does not re-allocate every frame.
+GPU_GRAY = cv2.cuda_GpuMat() if CUDA_CASCADE is not None else None
 
 
 INDEX_HTML = """
@@ -73,12 +273,88 @@ const statusEl = document.getElementById('status');
 
 let stream = null;
 let analyzeTimer = null;
+let analyzeInFlight = false;
+
+// Reused across frames — allocating a canvas per tick churns memory.
+const sendCanvas = document.createElement('canvas');
+const sendCtx = sendCanvas.getContext('2d', { willReadFrequently: true });
+let grayBuf = null;
+
+// Where supported, the pixel readback + luma conversion + upload run in a
+// worker fed transferred ImageBitmaps, so getImageData stalls never block
+// the thread that paints the overlay. The worker body is serialised from a
+// real function to avoid escaping a nested script string.
+function analyzeWorkerMain() {
+  let ctx = null;
+  let grayBuf = null;
+  self.onmessage = async (msg) => {
+    // Every message must produce exactly one reply — the page's single
+    // in-flight slot only reopens when one arrives — so the readback is
+    // inside the try as well, not just the fetch.
+    try {
+      const { bitmap, query } = msg.data;
+      const w = bitmap.width;
+      const h = bitmap.height;
+      if (!ctx || ctx.canvas.width !== w || ctx.canvas.height !== h) {
+        ctx = new OffscreenCanvas(w, h).getContext('2d', { willReadFrequently: true });
+      }
+      ctx.setTransform(-1, 0, 0, 1, w, 0);
+      ctx.drawImage(bitmap, 0, 0);
+      ctx.setTransform(1, 0, 0, 1, 0, 0);
+      bitmap.close();
+      const rgba = ctx.getImageData(0, 0, w, h).data;
+      if (!grayBuf || grayBuf.length !== w * h) grayBuf = new Uint8Array(w * h);
+      for (let i = 0, p = 0; i < grayBuf.length; i++, p += 4) {
+        grayBuf[i] = (19595 * rgba[p] + 38470 * rgba[p + 1] + 7471 * rgba[p + 2] + 32768) >> 16;
+      }
+      // The worker runs off a blob: URL, whose opaque path cannot resolve
+      // relative fetches — address the page's origin explicitly.
+      const resp = await fetch(`${self.location.origin}/analyze?w=${w}&h=${h}&${query}`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/octet-stream' },
+        body: grayBuf,
+      });
+      self.postMessage({ ok: true, data: await resp.json() });
+    } catch (_err) {
+      self.postMessage({ ok: false });
+    }
+  };
+}
+
+let analyzeWorker = null;
+if (typeof OffscreenCanvas === 'function' && typeof createImageBitmap === 'function') {
+  const workerSrc = '(' + analyzeWorkerMain.toString() + ')()';
+  analyzeWorker = new Worker(URL.createObjectURL(new Blob([workerSrc], { type: 'text/javascript' })));
+  analyzeWorker.onmessage = (msg) => {
+    analyzeInFlight = false;
+    if (msg.data.ok) {
+      applyTrackingResult(msg.data.data);
+    } else {
+      statusEl.textContent = 'Tracking alert: analysis request failed';
+    }
+  };
+  // A worker-level error (script failure, uncaught throw outside the
+  // handler) produces no reply; reopen the slot so analysis cannot wedge.
+  analyzeWorker.onerror = () => {
+    analyzeInFlight = false;
+    statusEl.textContent = 'Tracking alert: analysis request failed';
+  };
+}
 let draggingBand = false;
 let horizontalBandCenterY = 240;
 const horizontalBandHeight = 50;
 let latestTracking = null;
 
+// The overlay only changes when the band is dragged or a new tracking
+// result lands (~8 Hz) — repainting at display rate (60+ Hz) is wasted
+// raster work, so redraw only when marked dirty.
+let overlayDirty = true;
+
 function drawOverlay() {
+  requestAnimationFrame(drawOverlay);
+  if (!overlayDirty) return;
+  overlayDirty = false;
+
   const w = canvas.width;
   const h = canvas.height;
   ctx.clearRect(0, 0, w, h);
@@ -106,14 +382,23 @@ function drawOverlay() {
       ctx.fill();
     }
   }
+}
 
-  requestAnimationFrame(drawOverlay);
+// getBoundingClientRect forces layout, and drag events arrive at 100+ Hz —
+// cache the rect and refresh it only when the page geometry changes.
+let canvasRect = null;
+
+function refreshCanvasRect() {
+  canvasRect = canvas.getBoundingClientRect();
 }
 
+window.addEventListener('resize', refreshCanvasRect);
+window.addEventListener('scroll', refreshCanvasRect, { passive: true });
+
 function eventToVideoY(event) {
-  const rect = canvas.getBoundingClientRect();
-  const y = event.clientY - rect.top;
-  return Math.max(0, Math.min(canvas.height - 1, Math.round((y / rect.height) * canvas.height)));
+  if (!canvasRect || canvasRect.height === 0) refreshCanvasRect();
+  const y = event.clientY - canvasRect.top;
+  return Math.max(0, Math.min(canvas.height - 1, Math.round((y / canvasRect.height) * canvas.height)));
 }
 
 canvas.addEventListener('mousedown', (event) => {
@@ -126,42 +411,109 @@ canvas.addEventListener('mousedown', (event) => {
 window.addEventListener('mousemove', (event) => {
   if (!draggingBand) return;
   horizontalBandCenterY = eventToVideoY(event);
+  overlayDirty = true;
 });
 
 window.addEventListener('mouseup', () => { draggingBand = false; });
 
-async function analyzeFrame() {
+// Analyse only freshly presented camera frames: requestVideoFrameCallback
+// fires once per delivered frame, so together with the in-flight guard the
+// server never sees a stale buffered frame. Older browsers fall back to the
+// fixed interval.
+let vfcHandle = null;
+
+// Frame callbacks arrive at camera rate (~30 Hz); analyse on a fixed
+// cadence by advancing a deadline rather than sleeping a fixed delay, so
+// slow analyses do not make the effective rate drift.
+const ANALYZE_PERIOD_MS = 120;
+let nextAnalyzeDeadline = 0;
+
+function scheduleAnalyze() {
   if (!stream) return;
+  vfcHandle = video.requestVideoFrameCallback(() => {
+    const now = performance.now();
+    if (now >= nextAnalyzeDeadline) {
+      nextAnalyzeDeadline += ANALYZE_PERIOD_MS;
+      if (nextAnalyzeDeadline <= now) {
+        // Fell more than a period behind — resynchronise instead of bursting.
+        nextAnalyzeDeadline = now + ANALYZE_PERIOD_MS;
+      }
+      analyzeFrame();
+    }
+    scheduleAnalyze();
+  });
+}
+
+function applyTrackingResult(data) {
+  latestTracking = data;
+  overlayDirty = true;
+  statusEl.textContent = data.status;
+}
 
-  const sendCanvas = document.createElement('canvas');
-  sendCanvas.width = video.videoWidth;
-  sendCanvas.height = video.videoHeight;
-  const sendCtx = sendCanvas.getContext('2d');
+async function analyzeFrame() {
+  // Single-slot semantics: if the previous analysis is still in flight,
+  // drop this frame instead of queueing stale work behind it.
+  if (!stream || analyzeInFlight) return;
+  analyzeInFlight = true;
+
+  if (analyzeWorker) {
+    try {
+      // Transferring the bitmap hands the frame to the worker without a
+      // copy; the worker's reply clears the in-flight slot.
+      const bitmap = await createImageBitmap(video);
+      analyzeWorker.postMessage(
+        { bitmap, query: `y=${horizontalBandCenterY}&bh=${horizontalBandHeight}` },
+        [bitmap],
+      );
+    } catch (_err) {
+      analyzeInFlight = false;
+    }
+    return;
+  }
+
+  if (sendCanvas.width !== video.videoWidth || sendCanvas.height !== video.videoHeight) {
+    sendCanvas.width = video.videoWidth;
+    sendCanvas.height = video.videoHeight;
+  }
+  // Draw mirrored so the bytes arrive in the same orientation the server
+  // used to produce with cv2.flip — the GPU does the mirror for free here.
+  sendCtx.setTransform(-1, 0, 0, 1, sendCanvas.width, 0);
   sendCtx.drawImage(video, 0, 0, sendCanvas.width, sendCanvas.height);
-  const dataUrl = sendCanvas.toDataURL('image/jpeg', 0.8);
+  sendCtx.setTransform(1, 0, 0, 1, 0, 0);
 
   try {
-    const resp = await fetch('/analyze', {
-      method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify({
-        image_data: dataUrl,
-        horizontal_band_center_y: horizontalBandCenterY,
-        horizontal_band_height: horizontalBandHeight,
-      }),
-    });
-
-    const data = await resp.json();
-    latestTracking = data;
-    statusEl.textContent = data.status;
+    // Detection only needs the gray plane: send raw luma bytes and skip
+    // JPEG encoding here plus imdecode and the colour conversion server-side.
+    const w = sendCanvas.width;
+    const h = sendCanvas.height;
+    const rgba = sendCtx.getImageData(0, 0, w, h).data;
+    if (!grayBuf || grayBuf.length !== w * h) grayBuf = new Uint8Array(w * h);
+    // Fixed-point BT.601 luma (the libjpeg kernel): integer multiply-adds
+    // the JIT can vectorise, instead of per-pixel float math and truncation.
+    for (let i = 0, p = 0; i < grayBuf.length; i++, p += 4) {
+      grayBuf[i] = (19595 * rgba[p] + 38470 * rgba[p + 1] + 7471 * rgba[p + 2] + 32768) >> 16;
+    }
+    const resp = await fetch(
+      `/analyze?w=${w}&h=${h}&y=${horizontalBandCenterY}&bh=${horizontalBandHeight}`,
+      { method: 'POST', headers: { 'Content-Type': 'application/octet-stream' }, body: grayBuf },
+    );
+
+    applyTrackingResult(await resp.json());
   } catch (_err) {
     statusEl.textContent = 'Tracking alert: analysis request failed';
+  } finally {
+    analyzeInFlight = false;
   }
 }
 
 startBtn.addEventListener('click', async () => {
   if (stream) return;
-  stream = await navigator.mediaDevices.getUserMedia({ video: true, audio: false });
+  // 640x480 is plenty for face tracking and keeps every downstream step
+  // (JPEG encode, upload, decode, detection) 4-6x cheaper than HD.
+  stream = await navigator.mediaDevices.getUserMedia({
+    video: { width: { ideal: 640 }, height: { ideal: 480 } },
+    audio: false,
+  });
   video.srcObject = stream;
 
   await new Promise((resolve) => {
@@ -170,12 +522,19 @@ startBtn.addEventListener('click', async () => {
 
   canvas.width = video.videoWidth;
   canvas.height = video.videoHeight;
+  refreshCanvasRect();
+  overlayDirty = true;
   if (horizontalBandCenterY >= canvas.height) {
     horizontalBandCenterY = Math.floor(canvas.height / 2);
   }
 
   statusEl.textContent = 'Camera running';
-  analyzeTimer = setInterval(analyzeFrame, 120);
+  if ('requestVideoFrameCallback' in HTMLVideoElement.prototype) {
+    nextAnalyzeDeadline = performance.now();
+    scheduleAnalyze();
+  } else {
+    analyzeTimer = setInterval(analyzeFrame, ANALYZE_PERIOD_MS);
+  }
 });
 
 stopBtn.addEventListener('click', () => {
@@ -186,7 +545,12 @@ stopBtn.addEventListener('click', () => {
     clearInterval(analyzeTimer);
     analyzeTimer = null;
   }
+  if (vfcHandle !== null) {
+    video.cancelVideoFrameCallback(vfcHandle);
+    vfcHandle = null;
+  }
   latestTracking = null;
+  overlayDirty = true;
   statusEl.textContent = 'Camera stopped';
   ctx.clearRect(0, 0, canvas.width, canvas.height);
 });
@@ -205,84 +569,223 @@ def index() -> str:
 
 @app.post("/analyze")
 def analyze():
-    payload = request.get_json(silent=True) or {}
-    image_data = payload.get("image_data", "")
-    band_center_y = int(payload.get("horizontal_band_center_y", 240))
-    band_height = max(1, int(payload.get("horizontal_band_height", 50)))
-
-    if not image_data.startswith("data:image"):
-        return jsonify({"status": "Tracking alert: invalid frame payload", "tracking_bad": True}), 400
-
-    encoded = image_data.split(",", 1)[1]
-    frame_bytes = base64.b64decode(encoded)
-    image_array = cv2.imdecode(np.frombuffer(frame_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
-
-    if image_array is None:
-        return jsonify({"status": "Tracking alert: invalid frame data", "tracking_bad": True}), 400
-
-    frame = cv2.flip(image_array, 1)
-    frame_h = frame.shape[0]
+    gray = None
+    image_array = None
+    content_type = request.content_type or ""
+    if content_type.startswith("application/octet-stream"):
+        # Raw, already-mirrored luma plane from the client: no JPEG decode
+        # and no colour conversion anywhere.
+        width = request.args.get("w", 0, type=int)
+        height = request.args.get("h", 0, type=int)
+        band_center_y = request.args.get("y", 240, type=int)
+        band_height = max(1, request.args.get("bh", 50, type=int))
+        frame_bytes = request.get_data(cache=False)
+        if width <= 0 or height <= 0 or len(frame_bytes) != width * height:
+            return jsonify({"status": "Tracking alert: invalid frame payload", "tracking_bad": True}), 400
+        gray = np.frombuffer(frame_bytes, dtype=np.uint8).reshape(height, width)
+    elif content_type.startswith("image/"):
+        frame_bytes = request.get_data(cache=False)
+        band_center_y = request.args.get("y", 240, type=int)
+        band_height = max(1, request.args.get("h", 50, type=int))
+        if not frame_bytes:
+            return jsonify({"status": "Tracking alert: invalid frame payload", "tracking_bad": True}), 400
+    else:
+        # Legacy data-URL JSON payload from older clients.
+        payload = request.get_json(silent=True) or {}
+        image_data = payload.get("image_data", "")
+        band_center_y = int(payload.get("horizontal_band_center_y", 240))
+        band_height = max(1, int(payload.get("horizontal_band_height", 50)))
+
+        if not image_data.startswith("data:image"):
+            return jsonify({"status": "Tracking alert: invalid frame payload", "tracking_bad": True}), 400
+
+        frame_bytes = base64.b64decode(image_data.split(",", 1)[1])
+    if gray is None:
+        image_array = cv2.imdecode(np.frombuffer(frame_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image_array is None:
+            return jsonify({"status": "Tracking alert: invalid frame data", "tracking_bad": True}), 400
+        frame_h, frame_w = image_array.shape[:2]
+    else:
+        frame_h, frame_w = gray.shape
 
     band_center_y = max(0, min(frame_h - 1, band_center_y))
     band_half = band_height // 2
     band_top = max(0, band_center_y - band_half)
     band_bottom = min(frame_h - 1, band_center_y + band_half)
 
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    faces = FACE_CASCADE.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5)
-    profile_faces = []
-    if PROFILE_CASCADE is not None:
-        profile_faces = PROFILE_CASCADE.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=4)
-
-    result = {
-        "face": None,
-        "nose": None,
-        "tracking_bad": False,
-        "status": "Tracking good",
-    }
+    with STATE_LOCK:
+        STATE.frames_since_detect += 1
+        if STATE.tracker is not None and STATE.frames_since_detect < DETECT_INTERVAL:
+            ok, bbox = STATE.tracker.update(_mirrored_bgr(image_array, gray))
+            if ok:
+                STATE.tracked_face = tuple(int(round(v)) for v in bbox)
+                return jsonify(_interpolated_result(STATE.tracked_face, band_top, band_bottom))
+            STATE.tracker = None
+        elif STATE.tracked_face is not None and STATE.frames_since_detect < REUSE_INTERVAL:
+            return jsonify(_interpolated_result(STATE.tracked_face, band_top, band_bottom))
+
+        STATE.frames_since_detect = 0
+
+        # Static-scene prefilter: an unchanged frame cannot move the face, so
+        # compare coarse fingerprints and replay the confirmed box instead of
+        # pyramiding the same image again. Two orders of magnitude cheaper than
+        # a sweep; typical when the user sits still or has stepped away.
+        if gray is not None:
+            thumb = cv2.resize(gray, (8, 8), interpolation=cv2.INTER_AREA).astype(np.int16)
+            if (
+                STATE.last_sweep_hit
+                and STATE.tracked_face is not None
+                and STATE.prev_thumb is not None
+                and int(np.abs(thumb - STATE.prev_thumb).sum()) < SCENE_DIFF_THRESHOLD
+            ):
+                return jsonify(_interpolated_result(STATE.tracked_face, band_top, band_bottom))
+            STATE.prev_thumb = thumb
+
+        result = {
+            "face": None,
+            "nose": None,
+            "tracking_bad": False,
+            "status": "Tracking good",
+        }
+
+        faces = ()
+        profile_faces = ()
+        if YUNET is not None:
+            frame = _mirrored_bgr(image_array, gray)
+            if STATE.yunet_size != (frame_w, frame_h):
+                YUNET.setInputSize((frame_w, frame_h))
+                STATE.yunet_size = (frame_w, frame_h)
+            _, dnn_faces = YUNET.detect(frame)
+            if dnn_faces is not None and len(dnn_faces) > 0:
+                best = _largest_box(dnn_faces)
+                x, y, w, h = (int(v) for v in best[:4])
+                nose_x, nose_y = int(best[8]), int(best[9])
+                STATE.tracked_face = (x, y, w, h)
+                STATE.last_sweep_hit = True
+                STATE.tracker = _create_tracker()
+                if STATE.tracker is not None:
+                    STATE.tracker.init(frame, (x, y, w, h))
+
+                nose_outside_band = nose_y < band_top or nose_y > band_bottom
+                result["face"] = [x, y, w, h]
+                result["nose"] = [nose_x, nose_y]
+                result["tracking_bad"] = nose_outside_band
+                if nose_outside_band:
+                    result["status"] = "Tracking alert: face turned away or nose outside horizontal rectangle"
+                return jsonify(result)
+        else:
+            # Convert before mirroring: flipping the single gray channel touches a
+            # third of the bytes that flipping the BGR frame would.
+            if CUDA_CASCADE is not None:
+                if gray is None:
+                    gray = _gray_flipped(image_array)
+                small = _downscaled(gray)
+                GPU_GRAY.upload(small)
+                faces = CUDA_CASCADE.convert(CUDA_CASCADE.detectMultiScale(GPU_GRAY))
+            elif USE_OPENCL and gray is None:
+                ugray = cv2.flip(cv2.cvtColor(cv2.UMat(image_array), cv2.COLOR_BGR2GRAY), 1)
+                small = cv2.resize(ugray, None, fx=DETECT_SCALE, fy=DETECT_SCALE, interpolation=cv2.INTER_AREA)
+                # The nose ROI below slices with NumPy, so pull gray back once.
+                gray = ugray.get()
+            else:
+                if gray is None:
+                    gray = _gray_flipped(image_array)
+                small = _downscaled(gray)
+            # Both sweeps read the same immutable quarter-res gray, so they can
+            # run concurrently on the pool without locking.
+            frontal_future = None
+            if CUDA_CASCADE is None:
+                # Bounding the pyramid to plausible face sizes skips the tiny
+                # scales where most of the windows live.
+                frontal_future = DETECT_POOL.submit(
+                    FACE_CASCADE.detectMultiScale,
+                    small, scaleFactor=1.2, minNeighbors=5, minSize=DETECT_MIN_SIZE, maxSize=DETECT_MAX_SIZE,
+                )
+            if PROFILE_CASCADE is not None:
+                profile_faces = PROFILE_CASCADE.detectMultiScale(
+                    small, scaleFactor=1.2, minNeighbors=4, minSize=DETECT_MIN_SIZE, maxSize=DETECT_MAX_SIZE
+                )
+            if frontal_future is not None:
+                faces = frontal_future.result()
+
+        if len(faces) > 0:
+            x, y, w, h = (int(v) * DETECT_INV_SCALE for v in _largest_box(faces))
+            STATE.tracked_face = (x, y, w, h)
+            STATE.last_sweep_hit = True
+
+            STATE.tracker = _create_tracker()
+            if STATE.tracker is not None:
+                STATE.tracker.init(_mirrored_bgr(image_array, gray), (x, y, w, h))
+
+            nose_x = x + w // 2
+            nose_y = y + h // 2
+            nose_found = False
+
+            if FACEMARK is not None:
+                fitted, landmarks = FACEMARK.fit(gray, np.array([[x, y, w, h]]))
+                if fitted and len(landmarks) > 0:
+                    nose_x, nose_y = (int(v) for v in landmarks[0][0][NOSE_TIP_LANDMARK])
+                    nose_found = True
+            elif NOSE_CASCADE is not None:
+                roi_top = y + h // 4
+                nose_roi = gray[roi_top : y + h, x : x + w]
+                if nose_roi.size > 0:
+                    # Equalising the crop flattens lighting so the cascade
+                    # tolerates a coarser pyramid: scaleFactor 1.2 with a
+                    # face-proportional minSize prunes most levels, and
+                    # minNeighbors drops to 3 to offset the recall cost.
+                    # equalizeHist allocates its output here because the
+                    # raw-luma path hands us a read-only frame buffer.
+                    nose_roi = cv2.equalizeHist(nose_roi)
+                    noses = NOSE_CASCADE.detectMultiScale(
+                        nose_roi, scaleFactor=1.2, minNeighbors=3, minSize=(w // 8, h // 8)
+                    )
+                    if len(noses) > 0:
+                        nx, ny, nw, nh = _largest_box(noses)
+                        nose_x = x + int(nx + nw / 2)
+                        nose_y = roi_top + int(ny + nh / 2)
+                        nose_found = True
+
+            nose_outside_band = nose_y < band_top or nose_y > band_bottom
+            turned_away = (FACEMARK is not None or NOSE_CASCADE is not None) and not nose_found
+            tracking_bad = turned_away or nose_outside_band
+
+            result["face"] = [x, y, w, h]
+            result["nose"] = [nose_x, nose_y]
+            result["tracking_bad"] = tracking_bad
+            if tracking_bad:
+                result["status"] = "Tracking alert: face turned away or nose outside horizontal rectangle"
+
+        elif STATE.tracked_face is not None:
+            STATE.tracker = None
+            STATE.last_sweep_hit = False
+            # Do not replay a box the sweep just failed to confirm.
+            STATE.frames_since_detect = DETECT_INTERVAL
+            x, y, w, h = STATE.tracked_face
+            result["face"] = [x, y, w, h]
+            result["tracking_bad"] = True
+            if len(profile_faces) > 0:
+                result["status"] = "Tracking alert: user turned away from camera"
+            else:
+                result["status"] = "Tracking alert: face not found"
 
-    if len(faces) > 0:
-        x, y, w, h = map(int, max(faces, key=lambda box: box[2] * box[3]))
-        STATE.tracked_face = (x, y, w, h)
-
-        nose_x = x + w // 2
-        nose_y = y + h // 2
-        nose_found = False
-
-        nose_roi = gray[y + h // 4 : y + h, x : x + w]
-        if NOSE_CASCADE is not None and nose_roi.size > 0:
-            noses = NOSE_CASCADE.detectMultiScale(nose_roi, scaleFactor=1.1, minNeighbors=4)
-            if len(noses) > 0:
-                nx, ny, nw, nh = max(noses, key=lambda box: box[2] * box[3])
-                nose_x = x + int(nx + nw / 2)
-                nose_y = y + h // 4 + int(ny + nh / 2)
-                nose_found = True
-
-        nose_outside_band = nose_y < band_top or nose_y > band_bottom
-        turned_away = NOSE_CASCADE is not None and not nose_found
-        tracking_bad = turned_away or nose_outside_band
-
-        result["face"] = [x, y, w, h]
-        result["nose"] = [nose_x, nose_y]
-        result["tracking_bad"] = tracking_bad
-        if tracking_bad:
-            result["status"] = "Tracking alert: face turned away or nose outside horizontal rectangle"
-
-    elif STATE.tracked_face is not None:
-        x, y, w, h = STATE.tracked_face
-        result["face"] = [x, y, w, h]
-        result["tracking_bad"] = True
-        if len(profile_faces) > 0:
-            result["status"] = "Tracking alert: user turned away from camera"
         else:
+            STATE.tracker = None
+            STATE.last_sweep_hit = False
+            STATE.frames_since_detect = DETECT_INTERVAL
+            result["tracking_bad"] = True
             result["status"] = "Tracking alert: face not found"
 
-    else:
-        result["tracking_bad"] = True
-        result["status"] = "Tracking alert: face not found"
-
-    return jsonify(result)
+        return jsonify(result)
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=False)
+    # Werkzeug's dev server handles one request at a time, which serializes
+    # camera-frame POSTs. Prefer waitress when installed; OpenCV releases the
+    # GIL inside cvtColor/detectMultiScale, so worker threads scale here.
+    try:
+        from waitress import serve
+    except ImportError:
+        app.run(host="0.0.0.0", port=5000, debug=False, threaded=True)
+    else:
+        serve(app, host="0.0.0.0", port=5000, threads=8)